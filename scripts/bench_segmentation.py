@@ -0,0 +1,105 @@
+"""Compare --segment with extracting first and splitting the output in a separate pass
+
+Both sides use the same rules (korpus_extractor.sentence_splitter), so this measures where segmentation runs, not
+how fast the rules are. A synthetic NIKL newspaper corpus is generated in a temporary directory.
+
+    PYTHONPATH=src python scripts/bench_segmentation.py --members 3000 --workers 1
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import zipfile
+
+from korpus_extractor.modu_extractor import ModuExtractor
+from korpus_extractor.sentence_splitter import split_sentences
+
+ENDINGS = ["다.", "요.", "까?", "죠.", "다!", "습니다.", "다…"]
+
+
+def make_sentence(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(3, 12)):
+        words.append("".join(chr(rng.randint(0xAC00, 0xD7A3)) for _ in range(rng.randint(1, 4))))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"{rng.randint(1, 99)}.{rng.randint(0, 9)}%")
+    sentence = " ".join(words) + rng.choice(ENDINGS)
+    return f'"{sentence}"' if rng.random() < 0.1 else sentence
+
+
+def make_corpus(path: str, members: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(members):
+            paragraphs = [{"form": f"제목 {i}"}]
+            for _ in range(rng.randint(5, 25)):
+                paragraphs.append({"form": " ".join(make_sentence(rng) for _ in range(rng.randint(1, 10)))})
+            document = {"document": [{"paragraph": paragraphs}]}
+            z.writestr(f"NIKL_NEWSPAPER/NWRW{i:07d}.json", json.dumps(document, ensure_ascii=False))
+
+
+def resplit(input_path: str, output_path: str) -> None:
+    with open(input_path, encoding="utf-8") as fi, open(output_path, "w", encoding="utf-8") as fo:
+        for line in fi:
+            for sentence in split_sentences([line.rstrip("\n")]):
+                fo.write(sentence + "\n")
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=3000, help="number of synthetic json members")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of extraction workers")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per variant, the median is reported")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = os.path.join(tmp_dir, "NIKL_NEWSPAPER_v2.0.zip")
+        make_corpus(corpus_path, args.members, args.seed)
+        paragraphs_path = os.path.join(tmp_dir, "paragraphs.txt")
+        resplit_path = os.path.join(tmp_dir, "resplit.txt")
+        segmented_path = os.path.join(tmp_dir, "segmented.txt")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            extractor = ModuExtractor()
+        extract_times, resplit_times, segment_times = [], [], []
+        for _ in range(args.repeat):
+            extract_times.append(timed(extractor.extract, corpus_path, paragraphs_path, num_workers=args.workers))
+            resplit_times.append(timed(resplit, paragraphs_path, resplit_path))
+            segment_times.append(
+                timed(extractor.extract, corpus_path, segmented_path, num_workers=args.workers, segment=True)
+            )
+
+        with open(paragraphs_path, encoding="utf-8") as f:
+            paragraphs = sum(1 for _ in f)
+        with open(resplit_path, "rb") as f1, open(segmented_path, "rb") as f2:
+            identical = f1.read() == f2.read()
+            f1.seek(0)
+            sentences = sum(1 for _ in f1)
+
+    extract_time = statistics.median(extract_times)
+    resplit_time = statistics.median(resplit_times)
+    segment_time = statistics.median(segment_times)
+    print(f"{args.members} members, {paragraphs} paragraphs, {sentences} sentences, {args.workers} workers")
+    print(
+        f"extract + separate re-split pass: {extract_time:.2f}s + {resplit_time:.2f}s = "
+        f"{extract_time + resplit_time:.2f}s"
+    )
+    print(f"extract with --segment:           {segment_time:.2f}s")
+    print(f"identical output:                 {identical}")
+
+
+if __name__ == "__main__":
+    main()
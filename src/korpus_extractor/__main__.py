@@ -1,7 +1,7 @@
-from typing import Any, Callable, Literal
+from typing import Any, Callable
 from typing_extensions import Annotated
 
-from functools import wraps
+from functools import WRAPPER_ASSIGNMENTS, wraps
 
 import typer
 from merge_args import merge_args
@@ -21,17 +21,25 @@ app = typer.Typer(
 console = Console()
 
 
+def sample_rate_callback(sample_rate: float) -> float:
+    """Reject a sample rate of 0, which min=0 lets through (typer 0.9 has no open bounds)."""
+    if sample_rate == 0:
+        raise typer.BadParameter("0 is not in the range 0<x<=1.")
+    return sample_rate
+
+
 # wrapper pattern for common arguments (https://github.com/tiangolo/typer/issues/296)
 def cmd_extractor(
     func: Callable,
 ) -> Any:
+    # keep the annotations of the common arguments, typer needs them to parse numbers and flags
     @merge_args(func)
-    @wraps(func)
+    @wraps(func, assigned=tuple(a for a in WRAPPER_ASSIGNMENTS if a != "__annotations__"))
     def wrapper(
         ctx: typer.Context,
         input_path: str = typer.Option(..., "-i", "--input", metavar="PATH", help="Input file or directory."),
         output_path: str = typer.Option(..., "-o", "--output", metavar="PATH", help="Output file path."),
-        extraction_type: Literal["sentence", "document"] = typer.Option(
+        extraction_type: str = typer.Option(
             "sentence",
             "-t",
             "--type",
@@ -51,6 +59,61 @@ def cmd_extractor(
             metavar="SIZE",
             help="Maximum file size (e.g., 256m, 1g). If set, splits output into multiple files.",
         ),
+        limit: int = typer.Option(
+            None,
+            "--limit",
+            min=0,
+            metavar="N",
+            help="Stop after N sentences or documents have been written.",
+        ),
+        max_members: int = typer.Option(
+            None,
+            "--max-members",
+            min=0,
+            metavar="K",
+            help="Extract at most K files from the compressed corpora.",
+        ),
+        sample_rate: float = typer.Option(
+            None,
+            "--sample-rate",
+            min=0,
+            max=1,
+            callback=sample_rate_callback,
+            metavar="P",
+            help="Extract a deterministic sample of files with probability P (0 < P <= 1).",
+        ),
+        seed: int = typer.Option(
+            0,
+            "--seed",
+            metavar="SEED",
+            help="Seed for --sample-rate and --shuffle. The same seed always selects the same files.",
+        ),
+        stats: bool = typer.Option(
+            False,
+            "--stats",
+            help="Collect corpus statistics while extracting and save them to <output>.stats.json.",
+        ),
+        index: bool = typer.Option(
+            False,
+            "--index",
+            help="Write a uint64 line offset index (<file>.idx) next to each output file.",
+        ),
+        shuffle: bool = typer.Option(
+            False,
+            "--shuffle",
+            help="Shuffle the output lines globally, using temporary shards next to the output.",
+        ),
+        shuffle_buffer: str = typer.Option(
+            None,
+            "--shuffle-buffer",
+            metavar="SIZE",
+            help="Maximum size of a shard shuffled in memory (e.g., 256m, 1g). Defaults to 256m.",
+        ),
+        segment: bool = typer.Option(
+            False,
+            "--segment",
+            help="Split extracted paragraphs into sentences with rule-based Korean sentence segmentation.",
+        ),
         **kwargs,
     ):
         return func(ctx=ctx, **kwargs)
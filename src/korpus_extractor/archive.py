@@ -0,0 +1,403 @@
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import bisect
+import glob
+import io
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+# separator of nested member addresses, e.g. "bundle.tar!labels/TL_01.zip!TL_01/0001.json"
+ARCHIVE_SEPARATOR = "!"
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# nested archives read from a compressed tar or compressed in a zip are spooled to a temporary file once they are larger than this
+SPOOL_SIZE = 64 * 1024**2
+
+# byte-level splits ("a.zip.part0", "a.zip.001") that are plain concatenations of one zip file
+_SPLIT_SUFFIX = re.compile(r"\.(?:part(\d+)|(\d{3}))$")
+
+
+def is_archive(name: str) -> bool:
+    """Check whether the name refers to a zip or tar archive"""
+    name = strip_split_suffix(name).lower()
+    return name.endswith(ZIP_SUFFIXES) or name.endswith(TAR_SUFFIXES)
+
+
+def is_compressed_tar(name: str) -> bool:
+    """Check whether the name refers to a tar archive that can only be read as a stream"""
+    name = strip_split_suffix(name).lower()
+    return name.endswith(TAR_SUFFIXES) and not name.endswith(".tar")
+
+
+def strip_split_suffix(path: str) -> str:
+    """Remove the part suffix of a split archive ("a.zip.part0" -> "a.zip")"""
+    return _SPLIT_SUFFIX.sub("", path)
+
+
+def find_split_parts(path: str) -> List[str]:
+    """Find all parts of the split archive that the path belongs to, in order
+
+    Returns a single-element list if the path is not split.
+    """
+    match = _SPLIT_SUFFIX.search(path)
+    if match:
+        base = strip_split_suffix(path)
+        suffix = ".part*" if match.group(1) is not None else ".[0-9][0-9][0-9]"
+        parts = [p for p in glob.glob(glob.escape(base) + suffix) if _SPLIT_SUFFIX.search(p)]
+        return sorted(parts, key=lambda p: int(next(g for g in _SPLIT_SUFFIX.search(p).groups() if g is not None)))
+    if path.lower().endswith(".zip"):
+        # spanned zip: "a.z01", "a.z02", ..., "a.zip" (the central directory is in the last segment)
+        spans = sorted(glob.glob(glob.escape(path[:-4]) + ".z[0-9][0-9]"))
+        if spans:
+            return spans + [path]
+    return [path]
+
+
+class ConcatenatedFile(io.RawIOBase):
+    """Read-only seekable file that presents several files as one without joining them on disk"""
+
+    def __init__(self, paths: List[str]):
+        super().__init__()
+        self.paths = paths
+        self.name = paths[0]
+        self.offsets = [0]
+        for path in paths:
+            self.offsets.append(self.offsets[-1] + os.path.getsize(path))
+        self.size = self.offsets[-1]
+        self._files: Dict[int, BinaryIO] = {}
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position: {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        total = 0
+        while total < len(view) and self._pos < self.size:
+            index = bisect.bisect_right(self.offsets, self._pos) - 1
+            if index not in self._files:
+                self._files[index] = open(self.paths[index], "rb")
+            f = self._files[index]
+            f.seek(self._pos - self.offsets[index])
+            length = min(len(view) - total, self.offsets[index + 1] - self._pos)
+            n = f.readinto(view[total : total + length])
+            if not n:
+                break
+            total += n
+            self._pos += n
+        return total
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        super().close()
+
+
+class _MemberFile(io.RawIOBase):
+    """Seekable view of a byte range in a file object shared with other views"""
+
+    def __init__(self, fileobj: BinaryIO, offset: int, size: int, lock: threading.Lock):
+        super().__init__()
+        self.fileobj = fileobj
+        self.offset = offset
+        self.size = size
+        self.lock = lock
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        length = max(min(len(view), self.size - self._pos), 0)
+        if length == 0:
+            return 0
+        with self.lock:
+            self.fileobj.seek(self.offset + self._pos)
+            n = self.fileobj.readinto(view[:length])
+        self._pos += n
+        return n
+
+
+class TarArchive:
+    """zipfile-like reader for regular file members of an uncompressed tar archive
+
+    Reads of different members may run in parallel threads; they share the underlying file under a lock. Listing
+    only reads the member headers, and every read is a seek, so uncompressed tars are read in place like zips.
+    """
+
+    def __init__(self, fileobj: BinaryIO, filename: Optional[str] = None):
+        self.tarobj = tarfile.open(fileobj=fileobj, mode="r:")
+        self.filename = filename or getattr(fileobj, "name", None)
+        self.members = {m.name: m for m in self.tarobj.getmembers() if m.isreg() and not m.sparse}
+        self.lock = threading.Lock()
+
+    def namelist(self) -> List[str]:
+        return list(self.members)
+
+    def open(self, name: str) -> BinaryIO:
+        member = self.members[name]
+        return io.BufferedReader(_MemberFile(self.tarobj.fileobj, member.offset_data, member.size, self.lock))
+
+    def close(self) -> None:
+        self.tarobj.close()
+
+
+class TarStream:
+    """Reader for regular file members of a compressed tar archive, in a single pass in archive order
+
+    Seeking back in a compressed stream restarts decompression from the beginning, so members are only available
+    while iterating, each one until the next is requested.
+    """
+
+    def __init__(self, fileobj: BinaryIO, filename: Optional[str] = None):
+        self.tarobj = tarfile.open(fileobj=fileobj, mode="r|*")
+        self.filename = filename or getattr(fileobj, "name", None)
+        self.consumed = False
+
+    def __iter__(self) -> Iterator[Tuple[str, BinaryIO]]:
+        if self.consumed:
+            raise io.UnsupportedOperation(f"{self.filename} is a stream and can only be read once")
+        self.consumed = True
+        for member in self.tarobj:
+            if member.isreg():
+                yield member.name, self.tarobj.extractfile(member)
+
+    def close(self) -> None:
+        self.tarobj.close()
+
+
+class MemberData:
+    """Member whose bytes have already been read, opened like a member of an archive"""
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.data = data
+
+    def open(self, name: str) -> BinaryIO:
+        return io.BytesIO(self.data)
+
+
+def _fix_spanned_offsets(zipobj: zipfile.ZipFile, disk_offsets: List[int]) -> None:
+    """Make local header offsets of a spanned zip absolute within the concatenated segments
+
+    zipfile assumes every offset is relative to the disk holding the central directory, while spanned archives
+    store offsets relative to the disk each member starts on. zipfile (3.12.2+) also bounds each member by the offset
+    of the next one, so these bounds are recomputed from the rebased offsets the same way zipfile computes them.
+    """
+    cd_disk = bisect.bisect_right(disk_offsets, zipobj.start_dir) - 1
+    for info in zipobj.infolist():
+        info.header_offset += disk_offsets[info.volume] - disk_offsets[cd_disk]
+    if any(hasattr(info, "_end_offset") for info in zipobj.infolist()):
+        end_offset = zipobj.start_dir
+        for info in sorted(zipobj.infolist(), key=lambda info: info.header_offset, reverse=True):
+            info._end_offset = end_offset
+            end_offset = info.header_offset
+
+
+class ArchiveReader:
+    """zipfile-like reader over zip, split zip and tar archives, including archives nested in them
+
+    Members of nested archives are addressed by joining the member names with ARCHIVE_SEPARATOR, e.g.
+    "labels/TL_01.zip!TL_01/0001.json", so they go through the same listing and scheduling as plain members.
+    """
+
+    def __init__(
+        self,
+        container: Union[zipfile.ZipFile, TarArchive],
+        filename: str,
+        fileobj: Optional[BinaryIO] = None,
+        parent: Optional["ArchiveReader"] = None,
+        member: Optional[str] = None,
+    ):
+        self.container = container
+        self.filename = filename
+        self.fileobj = fileobj
+        self.parent = parent
+        self.member = member
+        self.nested: Dict[str, "ArchiveReader"] = {}
+        self.lock = threading.Lock()
+        # outermost reader to close along with this one when it was opened by a nested address
+        self.owner: Optional["ArchiveReader"] = None
+        self.closed = False
+
+    @property
+    def sequential(self) -> bool:
+        """Whether members can only be read once, in archive order, while iterating over them"""
+        return isinstance(self.container, TarStream)
+
+    def iter_members(
+        self, extension: Optional[str] = None, include: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Tuple[str, Union["ArchiveReader", MemberData]]]:
+        """Iterate over members with the extension as (name, source) pairs, where source.open(name) opens the member
+
+        Members of nested archives are included. `include` filters the names of this archive before they are
+        opened, e.g. to descend only into some of the archives in a bundle.
+
+        Members of compressed tars are read here, in archive order, and their sources hold the bytes, so the
+        stream is decompressed only once and only as far as the caller iterates. Archives nested in them are
+        spooled to a temporary file one at a time and read in the same way.
+        """
+        if self.sequential:
+            for name, fileobj in self.container:
+                if include is not None and not include(name):
+                    continue
+                filename = f"{self.filename}{ARCHIVE_SEPARATOR}{name}"
+                if is_archive(name):
+                    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+                        shutil.copyfileobj(fileobj, spool)
+                        spool.seek(0)
+                        with _open_container(spool, filename) as nested:
+                            for inner, source in nested.iter_members(extension):
+                                if source is nested:
+                                    with nested.open(inner) as f:
+                                        source = MemberData(nested.filename, f.read())
+                                yield f"{name}{ARCHIVE_SEPARATOR}{inner}", source
+                elif extension is None or name.endswith(f".{extension}"):
+                    yield name, MemberData(self.filename, fileobj.read())
+            return
+
+        for name in self.container.namelist():
+            if name.endswith("/") or (include is not None and not include(name)):
+                continue
+            if is_archive(name):
+                nested = self._open_nested(name)
+                for inner, source in nested.iter_members(extension):
+                    yield f"{name}{ARCHIVE_SEPARATOR}{inner}", self if source is nested else source
+            elif extension is None or name.endswith(f".{extension}"):
+                yield name, self
+
+    def namelist(self, extension: Optional[str] = None) -> List[str]:
+        return [name for name, _ in self.iter_members(extension)]
+
+    def open(self, name: str) -> BinaryIO:
+        if self.sequential:
+            raise io.UnsupportedOperation(f"Members of {self.filename} can only be read with iter_members")
+        outer, sep, inner = name.partition(ARCHIVE_SEPARATOR)
+        if sep:
+            return self._open_nested(outer).open(inner)
+        return self.container.open(name)
+
+    def _open_nested(self, name: str) -> "ArchiveReader":
+        with self.lock:
+            if name not in self.nested:
+                filename = f"{self.filename}{ARCHIVE_SEPARATOR}{name}"
+                fileobj = self.container.open(name)
+                if isinstance(self.container, zipfile.ZipFile) and (
+                    self.container.getinfo(name).compress_type != zipfile.ZIP_STORED
+                ):
+                    # seeking back in a compressed member decompresses it again from the start
+                    member, fileobj = fileobj, tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+                    with member:
+                        shutil.copyfileobj(member, fileobj)
+                    fileobj.seek(0)
+                self.nested[name] = _open_container(fileobj, filename, parent=self, member=name)
+            return self.nested[name]
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        for nested in list(self.nested.values()):
+            nested.close()
+        self.container.close()
+        if self.fileobj is not None:
+            self.fileobj.close()
+        if self.parent is not None:
+            with self.parent.lock:
+                self.parent.nested.pop(self.member, None)
+        if self.owner is not None:
+            self.owner.close()
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _open_container(fileobj: BinaryIO, filename: str, **kwargs) -> ArchiveReader:
+    name = strip_split_suffix(filename).lower()
+    if is_compressed_tar(name):
+        return ArchiveReader(TarStream(fileobj, filename=filename), filename, fileobj, **kwargs)
+    if name.endswith(TAR_SUFFIXES):
+        return ArchiveReader(TarArchive(fileobj, filename=filename), filename, fileobj, **kwargs)
+    return ArchiveReader(zipfile.ZipFile(fileobj), filename, fileobj, **kwargs)
+
+
+def _open_file(path: str) -> ArchiveReader:
+    parts = find_split_parts(path)
+    fileobj = ConcatenatedFile(parts) if len(parts) > 1 else open(path, "rb")
+    try:
+        reader = _open_container(fileobj, path)
+    except Exception:
+        fileobj.close()
+        raise
+    if len(parts) > 1 and parts[0].lower().endswith(".z01"):
+        _fix_spanned_offsets(reader.container, fileobj.offsets)
+    return reader
+
+
+def open_archive(path: str) -> ArchiveReader:
+    """Open an archive on disk, or an archive nested in one when the path contains ARCHIVE_SEPARATOR
+
+    Split zips ("a.zip.part0", "a.zip.001" or "a.z01" ... "a.zip") are read as one virtual file, so they never
+    have to be joined or unpacked on disk. Spanned zips that also need zip64 records are not supported.
+
+    Archives nested in compressed tars cannot be opened by their path; iterate over the members of the tar
+    instead.
+    """
+    if os.path.exists(path) or ARCHIVE_SEPARATOR not in path:
+        return _open_file(path)
+    path, _, inner = path.partition(ARCHIVE_SEPARATOR)
+    outer = _open_file(path)
+    try:
+        reader = outer
+        for name in inner.split(ARCHIVE_SEPARATOR):
+            if reader.sequential:
+                raise io.UnsupportedOperation(f"Archives in {reader.filename} can only be read with iter_members")
+            reader = reader._open_nested(name)
+    except Exception:
+        outer.close()
+        raise
+    reader.owner = outer
+    return reader
@@ -1,16 +1,232 @@
 from types import SimpleNamespace
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, BinaryIO, Callable, Collection, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
 
+import collections
+import concurrent.futures
+import fnmatch
+import glob
+import hashlib
+import itertools
 import json
 import os
+import random
 import re
+import shutil
+import struct
+import sys
+import tempfile
 import textwrap
-import zipfile
 from abc import ABC, abstractmethod
+from array import array
 
 import msgspec
+import psutil
 import yaml
 
+from .archive import ARCHIVE_SEPARATOR, TAR_SUFFIXES, ArchiveReader, is_archive, open_archive, strip_split_suffix
+from .stats import CorpusStats
+
+# (name, source) pair of a member to extract, where source.open(name) opens the member
+Member = Tuple[str, Any]
+
+# number of temporary shards lines are scattered into for --shuffle
+SHUFFLE_SHARDS = 64
+
+# length prefix of the lines in a shard, so that lines containing "\n" are shuffled as one line
+_SHARD_LINE_HEADER = struct.Struct("<I")
+
+
+def get_split_file_path(output_path: str, index: int) -> str:
+    """Generate split file path with index"""
+    dir_path = os.path.dirname(output_path)
+    base_name = os.path.basename(output_path)
+    name_without_ext = os.path.splitext(base_name)[0]
+    ext = os.path.splitext(base_name)[1]
+
+    # Create subdirectory with base name
+    split_dir = os.path.join(dir_path, name_without_ext)
+    if not os.path.exists(split_dir):
+        os.makedirs(split_dir, exist_ok=True)
+
+    return os.path.join(split_dir, f"{name_without_ext}-{index:05d}{ext}")
+
+
+class OutputWriter:
+    """Write extracted lines to a single file or to size-limited split files
+
+    With `index`, every output file gets a "<file>.idx" next to it: little-endian uint64 byte offsets of each line
+    followed by the file size, so line i of a memory-mapped index spans offsets[i]:offsets[i + 1].
+
+    With `shuffle`, lines are first scattered into randomly chosen temporary shards next to the output and every
+    shard is permuted in memory when the writer is closed, which shuffles the whole output in external memory.
+    Shards larger than `shuffle_buffer` bytes are scattered again before they are permuted.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        max_file_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        index: bool = False,
+        shuffle: bool = False,
+        shuffle_buffer: int = 256 * 1024 * 1024,
+        seed: int = 0,
+    ):
+        self.output_path = output_path
+        self.max_file_size = max_file_size
+        self.limit = limit
+        self.index = index
+        self.shuffle_buffer = shuffle_buffer
+        self.lines_written = 0
+        self.file_index = 1
+        self.file_size = 0
+        self.offsets = array("Q")
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        if max_file_size:
+            # Split file mode
+            self._open_output(get_split_file_path(output_path, self.file_index))
+        else:
+            # Single file mode
+            self._open_output(output_path)
+
+        self.rng = random.Random(seed) if shuffle else None
+        self.shuffle_dir = tempfile.mkdtemp(prefix=".shuffle-", dir=output_dir or ".") if shuffle else None
+        self.shards = [open(path, "wb") for path in self._shard_paths(self.shuffle_dir)] if shuffle else []
+
+    @property
+    def done(self) -> bool:
+        """Whether the line limit has been reached"""
+        return self.limit is not None and self.lines_written >= self.limit
+
+    def write(self, lines: Iterable[str]) -> int:
+        """Write non-empty lines until the limit is reached and return how many were written"""
+        written = 0
+        for line in lines:
+            if not line:
+                continue
+            if self.done:
+                break
+            line_bytes = line.encode("utf-8") + b"\n"
+            if self.shards:
+                shard = self.shards[self.rng.randrange(SHUFFLE_SHARDS)]
+                shard.write(_SHARD_LINE_HEADER.pack(len(line_bytes)) + line_bytes)
+            else:
+                self._write_line(line_bytes)
+            self.lines_written += 1
+            written += 1
+        self.fo.flush()
+        return written
+
+    def close(self) -> None:
+        try:
+            if self.shards:
+                for shard in self.shards:
+                    shard.close()
+                self.shards = []
+                for path in self._shard_paths(self.shuffle_dir):
+                    self._write_shuffled(path)
+        finally:
+            self._close_output()
+            if self.shuffle_dir is not None:
+                shutil.rmtree(self.shuffle_dir, ignore_errors=True)
+                self.shuffle_dir = None
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is not None:
+            # do not spend a shuffle pass on an aborted extraction
+            for shard in self.shards:
+                shard.close()
+            self.shards = []
+        self.close()
+
+    def _open_output(self, path: str) -> None:
+        self.fo = open(path, "wb")
+        self.file_size = 0
+        if self.index:
+            self.fi = open(f"{path}.idx", "wb")
+            self.offsets.append(0)
+
+    def _close_output(self) -> None:
+        self.fo.close()
+        if self.index:
+            self._flush_index()
+            self.fi.close()
+
+    def _flush_index(self) -> None:
+        if sys.byteorder != "little":
+            self.offsets.byteswap()
+        self.offsets.tofile(self.fi)
+        del self.offsets[:]
+
+    def _write_line(self, line_bytes: bytes) -> None:
+        if self.max_file_size and self.file_size > 0 and self.file_size + len(line_bytes) > self.max_file_size:
+            # Close current file and open new one
+            self._close_output()
+            self.file_index += 1
+            self._open_output(get_split_file_path(self.output_path, self.file_index))
+
+        self.fo.write(line_bytes)
+        self.file_size += len(line_bytes)
+        if self.index:
+            self.offsets.append(self.file_size)
+            if len(self.offsets) >= 65536:
+                self._flush_index()
+
+    @staticmethod
+    def _shard_paths(shard_dir: str) -> List[str]:
+        return [os.path.join(shard_dir, f"{i:03d}") for i in range(SHUFFLE_SHARDS)]
+
+    @staticmethod
+    def _read_shard(f: BinaryIO) -> Iterator[bytes]:
+        while True:
+            header = f.read(_SHARD_LINE_HEADER.size)
+            if not header:
+                return
+            yield f.read(_SHARD_LINE_HEADER.unpack(header)[0])
+
+    def _write_shuffled(self, path: str, depth: int = 0) -> None:
+        if os.path.getsize(path) > self.shuffle_buffer and depth < 3:
+            # too large to permute in memory, scatter it into smaller shards first
+            shard_dir = tempfile.mkdtemp(dir=self.shuffle_dir)
+            shards = [open(shard_path, "wb") for shard_path in self._shard_paths(shard_dir)]
+            try:
+                with open(path, "rb") as f:
+                    for line_bytes in self._read_shard(f):
+                        shard = shards[self.rng.randrange(SHUFFLE_SHARDS)]
+                        shard.write(_SHARD_LINE_HEADER.pack(len(line_bytes)) + line_bytes)
+            finally:
+                for shard in shards:
+                    shard.close()
+            os.remove(path)
+            for shard_path in self._shard_paths(shard_dir):
+                self._write_shuffled(shard_path, depth + 1)
+            os.rmdir(shard_dir)
+            return
+
+        with open(path, "rb") as f:
+            lines = list(self._read_shard(f))
+        os.remove(path)
+        self.rng.shuffle(lines)
+        for line_bytes in lines:
+            self._write_line(line_bytes)
+        self.fo.flush()
+
+    def get_stats_file_path(self) -> str:
+        """Path of the statistics file next to the output ("out/corpus.txt" -> "out/corpus.stats.json")"""
+        return f"{os.path.splitext(self.output_path)[0]}.stats.json"
+
+    def summary(self) -> str:
+        if self.max_file_size:
+            output_dir = os.path.dirname(get_split_file_path(self.output_path, 1))
+            return f"Output saved to {output_dir} ({self.file_index} files)"
+        return f"Output saved to {self.output_path}"
+
 
 class Extractor(ABC):
     def __init__(self):
@@ -55,17 +271,35 @@ class Extractor(ABC):
 
     def get_split_file_path(self, output_path: str, index: int) -> str:
         """Generate split file path with index"""
-        dir_path = os.path.dirname(output_path)
-        base_name = os.path.basename(output_path)
-        name_without_ext = os.path.splitext(base_name)[0]
-        ext = os.path.splitext(base_name)[1]
-        
-        # Create subdirectory with base name
-        split_dir = os.path.join(dir_path, name_without_ext)
-        if not os.path.exists(split_dir):
-            os.makedirs(split_dir, exist_ok=True)
-        
-        return os.path.join(split_dir, f"{name_without_ext}-{index:05d}{ext}")
+        return get_split_file_path(output_path, index)
+
+    @staticmethod
+    def _member_hash(name: str, seed: int) -> int:
+        # a cryptographic hash, since for CRCs of equally long inputs a different seed only XORs a constant
+        digest = hashlib.blake2b(f"{seed}:{name}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    @staticmethod
+    def select_members(
+        members: Iterable[Member],
+        max_members: Optional[int] = None,
+        sample_rate: Optional[float] = None,
+        seed: int = 0,
+    ) -> Iterator[Member]:
+        """Choose the members to extract before any of them is read
+
+        Sampling hashes each member name together with the seed, so a given seed always picks the same members
+        regardless of listing order or number of workers. Members are selected lazily, so that streamed archives
+        are only read as far as the selected members go.
+        """
+        if sample_rate is not None:
+            if not 0.0 < sample_rate <= 1.0:
+                raise ValueError(f"Sample rate must be in (0, 1]: {sample_rate}")
+            threshold = int(sample_rate * 2**64)
+            members = (m for m in members if Extractor._member_hash(m[0], seed) < threshold)
+        if max_members is not None:
+            members = itertools.islice(members, max(max_members, 0))
+        return iter(members)
 
     def create_msgspec_classes_from_dict(self, structure_dict: dict):
         def _create_msgspec_class_from_dict(dict_obj, class_name="Root"):
@@ -205,13 +439,185 @@ class ZippedJsonExtractor(Extractor):
 
     @staticmethod
     def read_filenames_in_zip(filepath, extension="json"):
-        assert os.path.exists(filepath)
         fileinfo = []
         try:
-            with open(filepath, "rb") as f:
-                zipped_file = zipfile.ZipFile(f)
-                fileinfo = [f.filename for f in zipped_file.infolist()]
-                fileinfo = [f for f in fileinfo if f.endswith(f".{extension}")]
+            with open_archive(filepath) as archive:
+                fileinfo = ZippedJsonExtractor.read_filenames_in_archive(archive, extension=extension)
         except Exception as e:
             print(e)
-        return sorted(fileinfo)
+        return fileinfo
+
+    @staticmethod
+    def read_filenames_in_archive(archive: ArchiveReader, extension="json") -> List[str]:
+        """List members with the extension, including members of nested archives"""
+        return [name for name, _ in ZippedJsonExtractor.list_members(archive, extension=extension)]
+
+    @staticmethod
+    def list_members(
+        archive: ArchiveReader, extension="json", include: Optional[Callable[[str], bool]] = None
+    ) -> Iterable[Member]:
+        """List members with the extension as (name, source) pairs, including members of nested archives
+
+        Random-access archives are listed up front and sorted by name. Compressed tars are listed lazily in
+        archive order, reading each member as it is listed (see ArchiveReader.iter_members).
+        """
+
+        def _iter_members():
+            try:
+                yield from archive.iter_members(extension=extension, include=include)
+            except Exception as e:
+                print(e)
+
+        if archive.sequential:
+            return _iter_members()
+        return sorted(_iter_members(), key=lambda m: m[0])
+
+    @staticmethod
+    def find_archives(corpus_path: str, file_patterns: List[str]) -> List[str]:
+        """Find archives matching the patterns, including split archives by their first part"""
+        archive_paths = []
+        for file_pattern in file_patterns:
+            pattern = os.path.join(corpus_path, file_pattern)
+            archive_paths.extend(glob.glob(pattern, recursive=True))
+            split_paths = {}
+            for suffix in (".part*", ".[0-9][0-9][0-9]"):
+                for split_path in sorted(glob.glob(pattern + suffix, recursive=True)):
+                    split_paths.setdefault(strip_split_suffix(split_path), split_path)
+            archive_paths.extend(split_paths.values())
+        return archive_paths
+
+    @staticmethod
+    def _fixed_dirs(path: str) -> List[str]:
+        """Leading directories of a path or pattern up to the first one with a wildcard"""
+        dirs = []
+        for part in os.path.normpath(path).split(os.sep)[:-1]:
+            if glob.has_magic(part) or part == ".":
+                break
+            dirs.append(part)
+        return dirs
+
+    @staticmethod
+    def find_bundles(corpus_path: str, file_patterns: List[str], archive_paths: List[str]) -> List[str]:
+        """Find tar bundles that may hold archives matching the patterns, without opening them
+
+        A bundle can only hold matching archives if its directory and the fixed directories of a pattern lie on
+        one path, e.g. "Training.tar" or "Training/labels.tar.gz" for "Training/*/*.zip", but not
+        "Validation/labels.tar". What a bundle holds is only listed while it is extracted.
+        """
+        bundle_paths = []
+        for suffix in TAR_SUFFIXES:
+            bundle_paths.extend(glob.glob(os.path.join(glob.escape(corpus_path), "**", f"*{suffix}"), recursive=True))
+        candidates = []
+        for bundle_path in sorted(set(bundle_paths) - set(archive_paths)):
+            bundle_dirs = ZippedJsonExtractor._fixed_dirs(os.path.relpath(bundle_path, corpus_path))
+            for file_pattern in file_patterns:
+                pattern_dirs = ZippedJsonExtractor._fixed_dirs(file_pattern)
+                n = min(len(bundle_dirs), len(pattern_dirs))
+                if bundle_dirs[:n] == pattern_dirs[:n]:
+                    candidates.append(bundle_path)
+                    break
+        return candidates
+
+    @staticmethod
+    def match_bundle_member(
+        name: str, bundle_path: str, file_patterns: List[str], unpacked: Collection[str] = ()
+    ) -> bool:
+        """Check whether a member of a bundle (`bundle_path` relative to the corpus) is an archive to extract
+
+        Archives that are also unpacked on disk, i.e. whose path relative to the corpus is in `unpacked`, are
+        skipped so that they are not extracted twice. The path of a member is resolved both from the directory of
+        the bundle and from a directory named like the bundle ("a.tar" holding "b/c.zip" unpacks to "a/b/c.zip").
+        """
+        if not is_archive(name):
+            return False
+        bundle_dir = os.path.dirname(bundle_path)
+        bundle_name = os.path.basename(bundle_path)
+        bundle_stem = next(bundle_name[: -len(s)] for s in TAR_SUFFIXES if bundle_name.lower().endswith(s))
+        path = os.path.normpath(os.path.join(bundle_dir, name))
+        if path in unpacked or os.path.normpath(os.path.join(bundle_dir, bundle_stem, name)) in unpacked:
+            return False
+        return any(
+            fnmatch.fnmatch(name, p) or fnmatch.fnmatch(name, f"*/{p}") or fnmatch.fnmatch(path, p)
+            for p in file_patterns
+        )
+
+    @staticmethod
+    def get_available_memory_ratio() -> float:
+        return psutil.virtual_memory().available * 100 / psutil.virtual_memory().total
+
+    def process_members(
+        self,
+        members: Iterable[Member],
+        read_fn: Callable[..., Optional[List[str]]],
+        writer: OutputWriter,
+        num_workers: Optional[int],
+        max_memory_ratio: float,
+        callback: Callable[[concurrent.futures.Future], None],
+        stats: Optional[CorpusStats] = None,
+        archive_name: Optional[str] = None,
+    ) -> int:
+        """Decode members in parallel and write their lines in submission order, returning the number submitted
+
+        `members` are (name, source) pairs, and `read_fn(source, filename)` reads and decodes one member. They are
+        consumed lazily, so members of a streamed archive are read in this thread, in order, only as fast as the
+        workers decode them.
+
+        At most twice as many members as workers are pending at a time. `max_memory_ratio` is the fraction of
+        the total memory (0 to 1) that may be in use: above it, no new member is submitted until the oldest
+        pending one has been written.
+
+        `read_fn` returns `None` for members that could not be decoded. If `stats` is given, every worker also
+        collects statistics of its member, which are merged here as the lines are written, counted for the
+        innermost archive of the member.
+
+        Once the writer reaches its limit, no further member is listed, members that have not started yet are
+        cancelled, and only the members already being read are waited for before returning.
+        """
+
+        def _read(source, filename):
+            lines = read_fn(source, filename=filename)
+            member_stats = CorpusStats.from_member(filename, lines) if stats is not None else None
+            return filename, lines or [], member_stats
+
+        def _write(future):
+            filename, lines, member_stats = future.result()
+            written = writer.write(lines)
+            if member_stats is not None:
+                if written < member_stats.lines:
+                    # the limit cut this member short, count only what was written
+                    member_stats = CorpusStats.from_member(filename, [line for line in lines if line][:written])
+                archive = archive_name
+                if archive is not None and ARCHIVE_SEPARATOR in filename:
+                    archive = f"{archive}{ARCHIVE_SEPARATOR}{filename.rsplit(ARCHIVE_SEPARATOR, 1)[0]}"
+                stats.merge(member_stats, archive=archive)
+
+        max_pending = 2 * (num_workers or os.cpu_count() or 1)
+        queue = collections.deque()
+        submitted = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+            members = iter(members)
+            # the next member is listed only while the limit has not been reached, as listing may read it from a stream
+            while not writer.done:
+                member = next(members, None)
+                if member is None:
+                    break
+                filename, source = member
+                submitted += 1
+                future = executor.submit(_read, source, filename)
+                future.add_done_callback(callback)
+                queue.append(future)
+                # write finished members in order, and wait for the oldest one instead of submitting more while
+                # too many members are pending or memory is short
+                while len(queue) > 0 and not writer.done:
+                    if queue[0].done():
+                        _write(queue.popleft())
+                    elif len(queue) >= max_pending or self.get_available_memory_ratio() < (1 - max_memory_ratio) * 100:
+                        concurrent.futures.wait([queue[0]])
+                    else:
+                        break
+            while len(queue) > 0 and not writer.done:
+                _write(queue.popleft())
+            for future in queue:
+                future.cancel()
+            queue.clear()
+        return submitted
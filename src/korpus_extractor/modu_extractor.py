@@ -1,18 +1,17 @@
 from typing import List, Literal, Optional
 
-import collections
 import concurrent.futures
 import functools
-import itertools
 import os
 import re
 import threading
-import zipfile
 
 import msgspec
-import psutil
 
-from .extractor import ZippedJsonExtractor
+from .archive import open_archive, strip_split_suffix
+from .extractor import OutputWriter, ZippedJsonExtractor
+from .sentence_splitter import split_sentences
+from .stats import CorpusStats
 
 
 class ModuExtractor(ZippedJsonExtractor):
@@ -48,7 +47,7 @@ class ModuExtractor(ZippedJsonExtractor):
             filename = re.sub(
                 f".{corpus_info['compressed_format']}$",
                 "",
-                os.path.basename(corpus_path),
+                strip_split_suffix(os.path.basename(corpus_path)),
             )
             if "file_names" in corpus_info:
                 for file_name in corpus_info["file_names"]:
@@ -62,8 +61,17 @@ class ModuExtractor(ZippedJsonExtractor):
         output_path: str,
         extraction_type: Literal["sentence", "document"] = "sentence",
         num_workers: Optional[int] = os.cpu_count(),
-        max_memory_ratio: float = 0.5,
+        max_memory_ratio: float = 0.9,
         size_limit: Optional[str] = None,
+        limit: Optional[int] = None,
+        max_members: Optional[int] = None,
+        sample_rate: Optional[float] = None,
+        seed: int = 0,
+        stats: bool = False,
+        index: bool = False,
+        shuffle: bool = False,
+        shuffle_buffer: Optional[str] = None,
+        segment: bool = False,
         **kwargs,
     ):
         corpus_info = self._get_corpus_info_by_path(corpus_path)
@@ -73,9 +81,11 @@ class ModuExtractor(ZippedJsonExtractor):
         _direction = corpus_info[self.direction_map.get(extraction_type, "sentence")]
         if not _extract or not _direction:
             raise ValueError(f"Extraction type {extraction_type} is not valid.")
+        if segment and extraction_type != "sentence":
+            raise ValueError("Sentence segmentation is only available for sentence extraction.")
 
         def _read_msgspec_in_zipobj(zipobj, filename):
-            data = []
+            data = None  # members that could not be decoded are reported as None
             try:
                 with zipobj.open(filename) as fj:
                     decoded_data = fj.read()
@@ -83,6 +93,8 @@ class ModuExtractor(ZippedJsonExtractor):
                         decoded_data = decoded_data.decode(corpus_info["file_encoding"])
                     _data = msgspec.json.decode(decoded_data, type=msgspec_class)
                     _data = _extract(_data, _direction, compressed_filename=filename)
+                    if segment:
+                        _data = split_sentences(_data)
                     data = _data
             except msgspec.ValidationError as e:
                 print(f"msgspec.ValidationError: {filename} in {zipobj.filename}")
@@ -95,103 +107,72 @@ class ModuExtractor(ZippedJsonExtractor):
             finally:
                 return data
 
-        def _get_available_memory_ratio() -> float:
-            return psutil.virtual_memory().available * 100 / psutil.virtual_memory().total
-
         def _progress_callback(
-            lock: List[threading.Lock], tasks_completed: List[int], tasks_total: int, _: concurrent.futures.Future
+            lock: List[threading.Lock],
+            tasks_completed: List[int],
+            tasks_total: Optional[int],
+            _: concurrent.futures.Future,
         ) -> None:
-            indexes = [int(tasks_total * (i / 10)) for i in range(1, 11)]
             with lock[0]:
                 tasks_completed[0] += 1
+                if tasks_total is None:
+                    # members of streamed archives are not counted in advance
+                    print(f"{tasks_completed[0]:#5d} completed", end="\r")
+                    return
+                indexes = [int(tasks_total * (i / 10)) for i in range(1, 11)]
                 percent = tasks_completed[0] / tasks_total * 100
                 line_end = "\n" if tasks_completed[0] in indexes else "\r"
                 print(f"{tasks_completed[0]:#5d} / {tasks_total} ({percent:6.2f} %) completed", end=line_end)
 
-        _filenames = self.read_filenames_in_zip(corpus_path, extension=corpus_info["file_format"])
-        filenames = []
-        for prefix in corpus_info["file_prefixes"]:
-            filenames.extend([f for f in _filenames if os.path.basename(f).startswith(prefix)])
-
-        lock = [threading.Lock()]  # make list to use it as reference in functools.partial
-        tasks_completed = [0]  # make list to use it as reference in functools.partial
-        tasks_total = len(filenames)
-        line_sep = itertools.repeat("\n")
-        queue = collections.deque()
-
-        _callback = functools.partial(_progress_callback, lock, tasks_completed, tasks_total)
-
         # Parse size limit
         max_file_size = self.parse_size_limit(size_limit) if size_limit else None
-        
-        if max_file_size:
-            # Split file mode
-            current_file_index = 1
-            current_file_size = 0
-            current_output_path = self.get_split_file_path(output_path, current_file_index)
-            fo = open(current_output_path, "w", encoding="utf-8")
-        else:
-            # Single file mode
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir, exist_ok=True)
-            fo = open(output_path, "w", encoding="utf-8")
+        corpus_stats = CorpusStats() if stats else None
 
-        with open(corpus_path, "rb") as fi:
-            try:
+        with open_archive(corpus_path) as archive:
+            _members = self.list_members(archive, extension=corpus_info["file_format"])
+            prefixes = corpus_info["file_prefixes"]
+            if archive.sequential:
+                members = (m for m in _members if os.path.basename(m[0]).startswith(tuple(prefixes)))
+            else:
+                members = []
+                for prefix in prefixes:
+                    members.extend([m for m in _members if os.path.basename(m[0]).startswith(prefix)])
+            members = self.select_members(members, max_members=max_members, sample_rate=sample_rate, seed=seed)
+            if not archive.sequential:
+                members = list(members)
+
+            lock = [threading.Lock()]  # make list to use it as reference in functools.partial
+            tasks_completed = [0]  # make list to use it as reference in functools.partial
+            tasks_total = len(members) if isinstance(members, list) else None
+
+            _callback = functools.partial(_progress_callback, lock, tasks_completed, tasks_total)
+
+            with OutputWriter(
+                output_path,
+                max_file_size=max_file_size,
+                limit=limit,
+                index=index,
+                shuffle=shuffle,
+                shuffle_buffer=self.parse_size_limit(shuffle_buffer),
+                seed=seed,
+            ) as writer:
                 print(f"Extracting {msgspec_class} from {corpus_path}...")
 
-                zipped_file = zipfile.ZipFile(fi)
-                with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                    for filename in filenames:
-                        future = executor.submit(_read_msgspec_in_zipobj, zipped_file, filename=filename)
-                        future.add_done_callback(_callback)
-                        queue.append(future)
-                        while _get_available_memory_ratio() > max_memory_ratio:
-                            if len(queue) == 0:
-                                break
-                            if queue[0].done():
-                                lines = [line for line in queue.popleft().result() if line]
-                                for line in lines:
-                                    line_with_sep = line + "\n"
-                                    line_bytes = len(line_with_sep.encode('utf-8'))
-                                    
-                                    if max_file_size and current_file_size + line_bytes > max_file_size:
-                                        # Close current file and open new one
-                                        fo.close()
-                                        current_file_index += 1
-                                        current_file_size = 0
-                                        current_output_path = self.get_split_file_path(output_path, current_file_index)
-                                        fo = open(current_output_path, "w", encoding="utf-8")
-                                    
-                                    fo.write(line_with_sep)
-                                    if max_file_size:
-                                        current_file_size += line_bytes
-                                fo.flush()
-                while len(queue) > 0:
-                    if queue[0].done():
-                        lines = [line for line in queue.popleft().result() if line]
-                        for line in lines:
-                            line_with_sep = line + "\n"
-                            line_bytes = len(line_with_sep.encode('utf-8'))
-                            
-                            if max_file_size and current_file_size + line_bytes > max_file_size:
-                                # Close current file and open new one
-                                fo.close()
-                                current_file_index += 1
-                                current_file_size = 0
-                                current_output_path = self.get_split_file_path(output_path, current_file_index)
-                                fo = open(current_output_path, "w", encoding="utf-8")
-                            
-                            fo.write(line_with_sep)
-                            if max_file_size:
-                                current_file_size += line_bytes
-                        fo.flush()
-
-            finally:
-                fo.close()
-
-        if max_file_size:
-            print(f"Extraction complete. Output saved to {os.path.dirname(self.get_split_file_path(output_path, 1))} ({current_file_index} files)")
-        else:
-            print(f"Extraction complete. Output saved to {output_path}")
+                self.process_members(
+                    members,
+                    _read_msgspec_in_zipobj,
+                    writer,
+                    num_workers,
+                    max_memory_ratio,
+                    _callback,
+                    stats=corpus_stats,
+                    archive_name=strip_split_suffix(os.path.basename(corpus_path)),
+                )
+                if tasks_total is None:
+                    print()
+
+        print(f"Extraction complete. {writer.summary()}")
+        if corpus_stats is not None:
+            stats_path = writer.get_stats_file_path()
+            corpus_stats.save(stats_path, input=corpus_path, extraction_type=extraction_type)
+            print(f"Statistics saved to {stats_path}")
@@ -0,0 +1,62 @@
+from typing import Iterable, List
+
+import re
+
+# A sentence ends with terminal punctuation after a Hangul syllable (다, 요, 까, 죠, ...), after a closing bracket or
+# quote that follows a letter ("발표했다(연합뉴스)."), after a bracket that opens after a Hangul syllable and closes
+# after a digit ("같다(표 1)."), with "!"/"?" after any other non-digit character, or with "." after two lowercase
+# Latin letters ("He left."), followed by whitespace. The last rule skips initials and abbreviations such as "U.S.",
+# "e.g." and "Mr.", and excludes "Mrs.", "Prof.", "vs." and "et al." explicitly. Closing quotes and brackets stay with
+# the sentence. Otherwise a period after a digit never ends a sentence, so numerals ("1.5%", "2. 항목",
+# "2023. 10. 19.") are kept intact.
+#
+# A quotative particle keeps a quote or a "!"/"?" in its sentence ("가자." 라고, 정말요? 하고), but not a plain period,
+# where the same syllables usually start the next sentence ("끝났습니다. 고 회장은", "웃었다. 하고 싶은").
+#
+# The pattern starts with a character class of the punctuation (and the opening bracket of the digit rule) rather than
+# a lookbehind so that the engine only stops there, and the replacement is a function because expanding a "\\1"
+# template is slower per match.
+_SENTENCE_BOUNDARY = re.compile(
+    r"""
+    (
+        [.!?\u2026(]
+        (?:
+            (?<=[\uac00-\ud7a3][.!?\u2026])
+            |(?<=[\uac00-\ud7a3A-Za-z][\"'\u201d\u2019\u300d\u300f\)\]][.!?\u2026])
+            |(?<=[^\s\d][!?])
+            |(?<=[a-z][a-z][.])(?<!\bMrs[.])(?<!\bProf[.])(?<!\bvs[.])(?<!\bal[.])
+            |(?<=[\uac00-\ud7a3][(])[^()\n]*\d\)[.!?\u2026]
+        )
+        [.!?\u2026]*
+        [\"'\u201d\u2019\u300d\u300f\)\]]*
+    )
+    (?:
+        (?<=[\"'\u201d\u2019\u300d\u300f!?])[^\S\n]+(?!(?:이?라고|하고|고)\s)
+        |(?<![\"'\u201d\u2019\u300d\u300f!?])[^\S\n]+
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+def _break_line(match: re.Match) -> str:
+    return match.group(1) + "\n"
+
+
+def split_sentences(lines: Iterable[str]) -> List[str]:
+    """Split extracted paragraphs into sentences with rule-based Korean sentence boundaries
+
+    All lines of a member are joined and split in a single regex pass instead of one pass per line.
+
+    >>> split_sentences(["주가가 1.5% 올랐다. 2023. 10. 19. 기준이다."])
+    ['주가가 1.5% 올랐다.', '2023. 10. 19. 기준이다.']
+    >>> split_sentences(['"가자." 라고 말했다. "좋아요!" 그가 답했다.'])
+    ['"가자." 라고 말했다.', '"좋아요!"', '그가 답했다.']
+    >>> split_sentences(["정부가 발표했다(연합뉴스). 다음 소식입니다.", "He left. She met Mr. Kim in the U.S. today."])
+    ['정부가 발표했다(연합뉴스).', '다음 소식입니다.', 'He left.', 'She met Mr. Kim in the U.S. today.']
+    """
+    text = "\n".join(line for line in lines if line)
+    if not text:
+        return []
+    text = _SENTENCE_BOUNDARY.sub(_break_line, text)
+    return [sentence.strip() for sentence in text.split("\n") if sentence.strip()]
@@ -0,0 +1,132 @@
+from typing import Any, Dict, Iterable, Optional
+
+import collections
+import json
+import os
+import re
+from array import array
+
+from .archive import ARCHIVE_SEPARATOR
+
+# length histograms use power-of-two buckets: bucket k counts lengths in [2 ** (k - 1), 2 ** k), bucket 0 is empty
+HISTOGRAM_BUCKETS = 33
+
+_HANGUL = re.compile(r"[\u1100-\u11ff\u3130-\u318f\ua960-\ua97f\uac00-\ud7ff]+")
+_LATIN = re.compile(r"[A-Za-z\u00c0-\u024f]+")
+_MEMBER_PREFIX = re.compile(r"[A-Za-z]+")
+
+
+def _histogram() -> array:
+    return array("Q", bytes(8 * HISTOGRAM_BUCKETS))
+
+
+def _bucket(length: int) -> int:
+    return min(length.bit_length(), HISTOGRAM_BUCKETS - 1)
+
+
+def get_member_prefix(filename: str) -> str:
+    """Leading letters of a member's file name ("NIKL/NWRW1800000021.json" -> "NWRW")
+
+    Members of nested archives are named by their innermost name ("TL_01.zip!NWRW1800000021.json" -> "NWRW").
+    """
+    match = _MEMBER_PREFIX.match(os.path.basename(filename.rsplit(ARCHIVE_SEPARATOR, 1)[-1]))
+    return match.group(0) if match else ""
+
+
+class CorpusStats:
+    """Statistics of extracted lines that can be collected per member and merged
+
+    Workers fill one instance per member; merging only adds counters and fixed-size histograms, so collecting
+    statistics costs no extra pass over the output.
+    """
+
+    def __init__(self):
+        self.members = 0
+        self.failed_members = 0
+        self.lines = 0
+        self.chars = 0
+        self.bytes = 0
+        self.hangul_chars = 0
+        self.latin_chars = 0
+        self.char_length_histogram = _histogram()
+        self.byte_length_histogram = _histogram()
+        self.lines_per_archive: Dict[str, int] = collections.Counter()
+        self.lines_per_prefix: Dict[str, int] = collections.Counter()
+
+    @classmethod
+    def from_member(cls, filename: str, lines: Optional[Iterable[str]]) -> "CorpusStats":
+        """Collect statistics of the lines extracted from a member, `None` if the member could not be decoded"""
+        stats = cls()
+        stats.members = 1
+        if lines is None:
+            stats.failed_members = 1
+            return stats
+        stats.update(lines, prefix=get_member_prefix(filename))
+        return stats
+
+    def update(self, lines: Iterable[str], prefix: Optional[str] = None) -> None:
+        count = 0
+        for line in lines:
+            if not line:
+                continue
+            count += 1
+            n_chars = len(line)
+            n_bytes = len(line.encode("utf-8"))
+            self.chars += n_chars
+            self.bytes += n_bytes
+            self.char_length_histogram[_bucket(n_chars)] += 1
+            self.byte_length_histogram[_bucket(n_bytes)] += 1
+            self.hangul_chars += sum(map(len, _HANGUL.findall(line)))
+            self.latin_chars += sum(map(len, _LATIN.findall(line)))
+        self.lines += count
+        if prefix is not None and count:
+            self.lines_per_prefix[prefix] += count
+
+    def merge(self, other: "CorpusStats", archive: Optional[str] = None) -> None:
+        """Add the statistics of another instance, counting its lines for the archive if given"""
+        self.members += other.members
+        self.failed_members += other.failed_members
+        self.lines += other.lines
+        self.chars += other.chars
+        self.bytes += other.bytes
+        self.hangul_chars += other.hangul_chars
+        self.latin_chars += other.latin_chars
+        for i in range(HISTOGRAM_BUCKETS):
+            self.char_length_histogram[i] += other.char_length_histogram[i]
+            self.byte_length_histogram[i] += other.byte_length_histogram[i]
+        self.lines_per_archive.update(other.lines_per_archive)
+        self.lines_per_prefix.update(other.lines_per_prefix)
+        if archive is not None and other.lines:
+            self.lines_per_archive[archive] += other.lines
+
+    @staticmethod
+    def _histogram_to_dict(histogram: array) -> Dict[str, int]:
+        # keyed by the smallest length in the bucket
+        return {str(1 << (k - 1) if k else 0): count for k, count in enumerate(histogram) if count}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "members": self.members,
+            "failed_members": self.failed_members,
+            "error_rate": self.failed_members / self.members if self.members else 0.0,
+            "lines": self.lines,
+            "chars": self.chars,
+            "bytes": self.bytes,
+            "mean_chars": self.chars / self.lines if self.lines else 0.0,
+            "mean_bytes": self.bytes / self.lines if self.lines else 0.0,
+            "hangul_ratio": self.hangul_chars / self.chars if self.chars else 0.0,
+            "latin_ratio": self.latin_chars / self.chars if self.chars else 0.0,
+            "char_length_histogram": self._histogram_to_dict(self.char_length_histogram),
+            "byte_length_histogram": self._histogram_to_dict(self.byte_length_histogram),
+            "lines_per_archive": dict(sorted(self.lines_per_archive.items())),
+            "lines_per_prefix": dict(sorted(self.lines_per_prefix.items())),
+        }
+
+    def save(self, path: str, **metadata) -> None:
+        """Write the statistics as JSON, preceded by the metadata (e.g. input path and extraction type)"""
+        output_dir = os.path.dirname(path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**metadata, **self.to_dict()}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
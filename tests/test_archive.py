@@ -0,0 +1,226 @@
+import bisect
+import io
+import os
+import struct
+import tarfile
+import tempfile
+import zipfile
+
+import pytest
+
+from korpus_extractor.archive import (
+    ConcatenatedFile,
+    MemberData,
+    find_split_parts,
+    open_archive,
+)
+from korpus_extractor.extractor import ZippedJsonExtractor
+
+MEMBERS = {f"d/{i}.json": f'{{"id": {i}, "text": "문장 {i}"}}'.encode() for i in range(5)}
+
+
+def make_zip(members=MEMBERS, compression=zipfile.ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members, mode="w:gz") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as t:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def read_all(archive):
+    return {name: source.open(name).read() for name, source in archive.iter_members("json")}
+
+
+def test_concatenated_file_seek_and_read(tmp_path):
+    chunks = [b"abc", b"", b"defgh", b"ij"]
+    paths = []
+    for i, chunk in enumerate(chunks):
+        path = tmp_path / f"f{i}"
+        path.write_bytes(chunk)
+        paths.append(str(path))
+
+    with ConcatenatedFile(paths) as f:
+        assert f.size == 10
+        assert f.read() == b"abcdefghij"
+        f.seek(2)
+        assert f.read(4) == b"cdef"
+        assert f.tell() == 6
+        f.seek(-3, io.SEEK_END)
+        assert f.read() == b"hij"
+        f.seek(-8, io.SEEK_CUR)
+        assert f.read(3) == b"cde"
+        f.seek(20)
+        assert f.read() == b""
+        with pytest.raises(ValueError):
+            f.seek(-1)
+
+
+@pytest.mark.parametrize("suffixes", [[".part0", ".part1", ".part2", ".part10"], [".001", ".002", ".003"]])
+def test_split_zip_is_read_in_place(tmp_path, suffixes):
+    data = make_zip()
+    size = -(-len(data) // len(suffixes))
+    for i, suffix in enumerate(suffixes):
+        (tmp_path / f"a.zip{suffix}").write_bytes(data[i * size : (i + 1) * size])
+
+    parts = find_split_parts(str(tmp_path / f"a.zip{suffixes[0]}"))
+    assert [p[len(str(tmp_path)) + 6 :] for p in parts] == suffixes
+    with open_archive(parts[0]) as archive:
+        assert read_all(archive) == MEMBERS
+
+
+def make_spanned_zip(path, cuts):
+    """Write MEMBERS as a spanned zip ("a.z01", "a.z02", ..., "a.zip") whose disks start at `cuts` in the plain zip
+
+    The central directory and the end record go on the last disk, and offsets are rewritten relative to the disk
+    each record starts on, like zip -s does.
+    """
+    data = bytearray(make_zip(compression=zipfile.ZIP_STORED))
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as z:
+        start_dir = z.start_dir
+    bounds = [0, *cuts, start_dir]
+    last_disk = len(bounds) - 1
+    pos = start_dir
+    while data[pos : pos + 4] == b"PK\x01\x02":
+        (offset,) = struct.unpack_from("<I", data, pos + 42)
+        disk = bisect.bisect_right(bounds, offset) - 1
+        struct.pack_into("<H", data, pos + 34, disk)
+        struct.pack_into("<I", data, pos + 42, offset - bounds[disk])
+        pos += 46 + sum(struct.unpack_from("<HHH", data, pos + 28))
+    struct.pack_into("<HH", data, pos + 4, last_disk, last_disk)
+    struct.pack_into("<I", data, pos + 16, 0)
+
+    bounds.append(len(data))
+    for disk in range(last_disk + 1):
+        suffix = ".zip" if disk == last_disk else f".z{disk + 1:02d}"
+        (path.parent / (path.stem + suffix)).write_bytes(data[bounds[disk] : bounds[disk + 1]])
+
+
+def test_spanned_zip_is_read_in_place(tmp_path):
+    with zipfile.ZipFile(io.BytesIO(make_zip(compression=zipfile.ZIP_STORED))) as z:
+        infos = z.infolist()
+    # the second member spans the first two disks and the third disk holds the third member only
+    make_spanned_zip(tmp_path / "a.zip", [infos[1].header_offset + 40, infos[2].header_offset, infos[3].header_offset])
+
+    parts = find_split_parts(str(tmp_path / "a.zip"))
+    assert [os.path.basename(p) for p in parts] == ["a.z01", "a.z02", "a.z03", "a.z04", "a.zip"]
+    with open_archive(str(tmp_path / "a.zip")) as archive:
+        assert read_all(archive) == MEMBERS
+        infos = archive.container.infolist()
+        if hasattr(infos[0], "_end_offset"):
+            assert [info._end_offset for info in infos] == [info.header_offset for info in infos[1:]] + [
+                archive.container.start_dir
+            ]
+
+
+def test_nested_archives_are_addressed_with_separator(tmp_path):
+    inner = make_zip()
+    outer = tmp_path / "outer.zip"
+    outer.write_bytes(make_zip({"labels/inner.zip": inner, "top.json": b"{}"}, compression=zipfile.ZIP_STORED))
+
+    with open_archive(str(outer)) as archive:
+        names = archive.namelist("json")
+        assert names == ["labels/inner.zip!" + name for name in MEMBERS] + ["top.json"]
+        assert archive.open("labels/inner.zip!d/3.json").read() == MEMBERS["d/3.json"]
+
+    with open_archive(f"{outer}!labels/inner.zip") as archive:
+        assert archive.filename == f"{outer}!labels/inner.zip"
+        assert read_all(archive) == MEMBERS
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_compressed_nested_zip_is_spooled(tmp_path, compression):
+    outer = tmp_path / "outer.zip"
+    outer.write_bytes(make_zip({"inner.zip": make_zip()}, compression=compression))
+
+    with open_archive(f"{outer}!inner.zip") as archive:
+        # a compressed member is not seekable in place, so it is read once into a spooled file
+        spooled = isinstance(archive.fileobj, tempfile.SpooledTemporaryFile)
+        assert spooled == (compression != zipfile.ZIP_STORED)
+        assert read_all(archive) == MEMBERS
+    assert archive.fileobj.closed
+
+
+def test_nested_readers_are_closed_with_their_owner(tmp_path):
+    outer = tmp_path / "outer.zip"
+    outer.write_bytes(make_zip({"inner.zip": make_zip()}, compression=zipfile.ZIP_STORED))
+
+    archive = open_archive(f"{outer}!inner.zip")
+    owner = archive.owner
+    assert owner is not None and owner.nested["inner.zip"] is archive
+    archive.close()
+    assert owner.closed and owner.nested == {}
+
+    with open_archive(str(outer)) as archive:
+        nested = archive._open_nested("inner.zip")
+        assert archive._open_nested("inner.zip") is nested
+        nested.close()
+        assert archive.nested == {}
+    assert archive.closed
+
+
+def test_uncompressed_tar_is_read_in_place(tmp_path):
+    path = tmp_path / "a.tar"
+    path.write_bytes(make_tar(MEMBERS, mode="w"))
+
+    with open_archive(str(path)) as archive:
+        assert not archive.sequential
+        assert archive.namelist("json") == list(MEMBERS)
+        assert archive.open("d/2.json").read() == MEMBERS["d/2.json"]
+
+
+def test_compressed_tar_is_streamed_once(tmp_path):
+    path = tmp_path / "bundle.tar.gz"
+    path.write_bytes(make_tar({"labels/TL_01.zip": make_zip(), "other/x.json": b"{}", "labels/TL_02.zip": b"PK"}))
+
+    with open_archive(str(path)) as archive:
+        assert archive.sequential
+        with pytest.raises(io.UnsupportedOperation):
+            archive.open("other/x.json")
+        members = list(archive.iter_members("json", include=lambda name: name.startswith("labels/TL_01")))
+        assert all(isinstance(source, MemberData) for _, source in members)
+        assert {name: source.open(name).read() for name, source in members} == {
+            "labels/TL_01.zip!" + name: data for name, data in MEMBERS.items()
+        }
+        with pytest.raises(io.UnsupportedOperation):
+            list(archive.iter_members("json"))
+
+    with pytest.raises(io.UnsupportedOperation):
+        open_archive(f"{path}!labels/TL_01.zip")
+
+
+def test_bundles_are_found_by_directory_without_opening_them(tmp_path):
+    for path in ["Training/labels.tar.gz", "Training.tar", "Validation/labels.tar", "Training/a/TL_01.zip"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_bytes(b"not opened")
+    patterns = ["Training/*/*.zip"]
+
+    archive_paths = ZippedJsonExtractor.find_archives(str(tmp_path), patterns)
+    assert archive_paths == [str(tmp_path / "Training/a/TL_01.zip")]
+    bundle_paths = ZippedJsonExtractor.find_bundles(str(tmp_path), patterns, archive_paths)
+    assert sorted(bundle_paths) == [str(tmp_path / "Training.tar"), str(tmp_path / "Training/labels.tar.gz")]
+
+    assert ZippedJsonExtractor.match_bundle_member("b/TL_02.zip", "Training/labels.tar.gz", patterns)
+    assert ZippedJsonExtractor.match_bundle_member("Training/b/TL_02.zip", "bundle.tar", patterns)
+    assert not ZippedJsonExtractor.match_bundle_member("b/TL_02.json", "Training/labels.tar.gz", patterns)
+
+
+def test_bundle_members_unpacked_on_disk_are_skipped():
+    patterns = ["Training/*/*.zip"]
+    unpacked = {"Training/a/TL_01.zip", "Training/a/TL_03.zip"}
+
+    # resolved from the directory of the bundle
+    assert not ZippedJsonExtractor.match_bundle_member("Training/a/TL_01.zip", "bundle.tar", patterns, unpacked)
+    assert not ZippedJsonExtractor.match_bundle_member("a/TL_03.zip", "Training/labels.tar", patterns, unpacked)
+    # resolved from a directory named like the bundle
+    assert not ZippedJsonExtractor.match_bundle_member("a/TL_01.zip", "Training.tar.gz", patterns, unpacked)
+    assert ZippedJsonExtractor.match_bundle_member("Training/a/TL_02.zip", "bundle.tar", patterns, unpacked)
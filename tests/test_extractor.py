@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from korpus_extractor.extractor import Extractor, OutputWriter, ZippedJsonExtractor
+
+NAMES = [f"NIKL_NEWSPAPER/NWRW{i:07d}.json" for i in range(20000)]
+
+
+def select(sample_rate, seed, names=NAMES):
+    return {
+        name
+        for name, _ in Extractor.select_members(((name, None) for name in names), sample_rate=sample_rate, seed=seed)
+    }
+
+
+@pytest.mark.parametrize("sample_rate", [0.5, 0.25, 0.1])
+def test_sample_size_and_overlap_between_seeds(sample_rate):
+    samples = [select(sample_rate, seed) for seed in (1, 2, 3, 7)]
+    # allow five binomial standard deviations
+    for sample in samples:
+        assert abs(len(sample) - sample_rate * len(NAMES)) < 5 * (len(NAMES) * sample_rate * (1 - sample_rate)) ** 0.5
+    for i, a in enumerate(samples):
+        for b in samples[i + 1 :]:
+            # independent samples share about sample_rate of their members
+            assert abs(len(a & b) - sample_rate * len(a)) < 5 * (len(a) * sample_rate * (1 - sample_rate)) ** 0.5
+
+
+def test_sample_is_deterministic_and_independent_of_order():
+    assert select(0.3, 5) == select(0.3, 5, names=list(reversed(NAMES)))
+    assert select(1.0, 5) == set(NAMES)
+
+
+def test_max_members_keeps_listing_order():
+    members = [(name, None) for name in NAMES[:10]]
+    assert list(Extractor.select_members(members, max_members=3)) == members[:3]
+    assert list(Extractor.select_members(members, max_members=0)) == []
+    assert list(Extractor.select_members(iter(members), max_members=20)) == members
+
+
+@pytest.mark.parametrize("sample_rate", [0.0, -0.5, 1.5])
+def test_invalid_sample_rate_is_rejected_before_listing(sample_rate):
+    def members():
+        raise AssertionError("listed")
+        yield
+
+    with pytest.raises(ValueError):
+        Extractor.select_members(members(), sample_rate=sample_rate)
+
+
+class DummyExtractor(ZippedJsonExtractor):
+    def extract(self, corpus_path, output_path, **kwargs):
+        raise NotImplementedError
+
+
+def run_members(tmp_path, count, lines_per_member, limit, num_workers=2, delay=0.0):
+    calls = []
+
+    def read_fn(source, filename):
+        calls.append(filename)
+        time.sleep(delay)
+        return [f"{filename} {i}" for i in range(lines_per_member)]
+
+    members = ((f"{i:04d}.json", None) for i in range(count))
+    output_path = tmp_path / "out.txt"
+    with OutputWriter(str(output_path), limit=limit) as writer:
+        submitted = DummyExtractor().process_members(members, read_fn, writer, num_workers, 1.0, lambda _: None)
+    return submitted, calls, output_path.read_text(encoding="utf-8").splitlines()
+
+
+def test_process_members_writes_in_submission_order(tmp_path):
+    submitted, calls, lines = run_members(tmp_path, 50, 3, limit=None, num_workers=4)
+    assert submitted == 50 and sorted(calls) == [f"{i:04d}.json" for i in range(50)]
+    assert lines == [f"{i:04d}.json {j}" for i in range(50) for j in range(3)]
+
+
+def test_process_members_reads_nothing_with_limit_zero(tmp_path):
+    assert run_members(tmp_path, 10, 3, limit=0) == (0, [], [])
+
+
+def test_process_members_stops_listing_and_cancels_at_limit(tmp_path):
+    submitted, calls, lines = run_members(tmp_path, 1000, 3, limit=7, num_workers=2, delay=0.01)
+    assert lines == [f"{i:04d}.json {j}" for i in range(3) for j in range(3)][:7]
+    # at most 2 * num_workers members are pending when the limit is reached, and cancelled ones are never read
+    assert submitted <= 3 + 4
+    assert len(calls) <= submitted
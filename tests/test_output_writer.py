@@ -0,0 +1,121 @@
+import glob
+import os
+import struct
+
+import pytest
+
+from korpus_extractor.extractor import OutputWriter
+
+LINES = [f"문장 {i} " + "가" * (i % 7) for i in range(500)]
+
+
+def read_index(path):
+    data = open(path, "rb").read()
+    assert len(data) % 8 == 0
+    return list(struct.unpack(f"<{len(data) // 8}Q", data))
+
+
+def output_files(output_path):
+    """Output files in order, the single file or the split files"""
+    split_files = sorted(glob.glob(os.path.join(os.path.splitext(output_path)[0], "*.txt")))
+    return split_files or [output_path]
+
+
+def write(output_path, lines=LINES, **kwargs):
+    with OutputWriter(str(output_path), **kwargs) as writer:
+        # several batches, as members are written one by one
+        for i in range(0, len(lines), 64):
+            writer.write(lines[i : i + 64])
+    return writer
+
+
+def read_records(output_path):
+    """Lines of all output files, cut by their index so that lines containing newlines stay whole"""
+    records = []
+    for path in output_files(output_path):
+        data = open(path, "rb").read()
+        offsets = read_index(f"{path}.idx")
+        assert offsets[0] == 0 and offsets[-1] == len(data)
+        records += [data[start:end].decode("utf-8")[:-1] for start, end in zip(offsets, offsets[1:])]
+    return records
+
+
+def test_index_holds_line_offsets(tmp_path):
+    output_path = tmp_path / "out.txt"
+    write(output_path, index=True)
+
+    offsets = read_index(f"{output_path}.idx")
+    assert len(offsets) == len(LINES) + 1
+    data = output_path.read_bytes()
+    assert [data[start:end] for start, end in zip(offsets, offsets[1:])] == [f"{x}\n".encode() for x in LINES]
+
+
+def test_index_is_reset_for_every_split_file(tmp_path):
+    output_path = tmp_path / "out.txt"
+    writer = write(output_path, max_file_size=1000, index=True)
+
+    paths = output_files(str(output_path))
+    assert len(paths) == writer.file_index > 1
+    lines = []
+    for path in paths:
+        data = open(path, "rb").read()
+        assert len(data) <= 1000
+        offsets = read_index(f"{path}.idx")
+        assert offsets[0] == 0 and offsets[-1] == len(data)
+        assert len(offsets) == data.count(b"\n") + 1
+        lines += data.decode("utf-8").splitlines()
+    assert lines == LINES
+
+
+@pytest.mark.parametrize("shuffle_buffer", [256 * 1024**2, 64])
+def test_shuffle_is_a_permutation(tmp_path, shuffle_buffer):
+    write(tmp_path / "plain.txt")
+    write(tmp_path / "shuffled.txt", shuffle=True, shuffle_buffer=shuffle_buffer)
+
+    plain = (tmp_path / "plain.txt").read_text(encoding="utf-8").splitlines()
+    shuffled = (tmp_path / "shuffled.txt").read_text(encoding="utf-8").splitlines()
+    assert shuffled != plain
+    assert sorted(shuffled) == sorted(plain) == sorted(LINES)
+    assert glob.glob(str(tmp_path / ".shuffle-*")) == []
+
+
+def test_shuffle_is_deterministic_per_seed(tmp_path):
+    write(tmp_path / "a.txt", shuffle=True, seed=1)
+    write(tmp_path / "b.txt", shuffle=True, seed=1)
+    write(tmp_path / "c.txt", shuffle=True, seed=2)
+
+    assert (tmp_path / "a.txt").read_bytes() == (tmp_path / "b.txt").read_bytes()
+    assert (tmp_path / "a.txt").read_bytes() != (tmp_path / "c.txt").read_bytes()
+
+
+def test_shuffle_with_split_files_and_index(tmp_path):
+    output_path = tmp_path / "out.txt"
+    write(output_path, max_file_size=1000, index=True, shuffle=True, shuffle_buffer=64)
+
+    paths = output_files(str(output_path))
+    assert len(paths) > 1
+    assert all(os.path.getsize(path) <= 1000 for path in paths)
+    records = read_records(str(output_path))
+    assert records != LINES and sorted(records) == sorted(LINES)
+
+
+def test_lines_with_newlines_are_shuffled_whole(tmp_path):
+    lines = [f"첫 줄 {i}\n둘째 줄 {i}" if i % 3 == 0 else f"문장 {i}" for i in range(300)]
+    output_path = tmp_path / "out.txt"
+    write(output_path, lines=lines, index=True, shuffle=True, shuffle_buffer=64)
+
+    records = read_records(str(output_path))
+    assert len(records) == len(lines)
+    assert sorted(records) == sorted(lines)
+
+
+def test_limit_stops_writing(tmp_path):
+    output_path = tmp_path / "out.txt"
+    with OutputWriter(str(output_path), limit=10, shuffle=True) as writer:
+        assert writer.write(["", "a", "b"]) == 2
+        assert writer.write(LINES) == 8
+        assert writer.done
+        assert writer.write(LINES) == 0
+
+    assert writer.lines_written == 10
+    assert len(output_path.read_text(encoding="utf-8").splitlines()) == 10
@@ -0,0 +1,60 @@
+import doctest
+
+import pytest
+
+from korpus_extractor import sentence_splitter
+from korpus_extractor.sentence_splitter import split_sentences
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # numerals
+        ("주가가 1.5% 올랐다. 다음 주에 발표한다.", ["주가가 1.5% 올랐다.", "다음 주에 발표한다."]),
+        ("1. 개요 2. 방법", ["1. 개요 2. 방법"]),
+        ("2023. 10. 19. 기준이다.", ["2023. 10. 19. 기준이다."]),
+        ("버전 3.11. 이후에도 같다.", ["버전 3.11. 이후에도 같다."]),
+        # quotative particles keep the quote in its sentence
+        ('"가자." 라고 말했다.', ['"가자." 라고 말했다.']),
+        ('"학생입니다." 이라고 답했다.', ['"학생입니다." 이라고 답했다.']),
+        ("정말요? 하고 물었다.", ["정말요? 하고 물었다."]),
+        ('"좋다." 고 생각했다.', ['"좋다." 고 생각했다.']),
+        # but not a plain period, where the same syllables start the next sentence
+        ("회의는 3시에 끝났습니다. 고 회장은 말했다.", ["회의는 3시에 끝났습니다.", "고 회장은 말했다."]),
+        ("그는 웃었다. 하고 싶은 말이 많았다.", ["그는 웃었다.", "하고 싶은 말이 많았다."]),
+        # quotes and brackets stay with the sentence
+        ('"좋아요!" 그가 답했다.', ['"좋아요!"', "그가 답했다."]),
+        ("“정말 그랬다.” 다음 날이었다.", ["“정말 그랬다.”", "다음 날이었다."]),
+        ("「끝났다.」 그리고 시작됐다.", ["「끝났다.」", "그리고 시작됐다."]),
+        ("정부가 발표했다(연합뉴스). 다음 소식입니다.", ["정부가 발표했다(연합뉴스).", "다음 소식입니다."]),
+        ("결과는 다음과 같다(표 1). 그러나 달랐다.", ["결과는 다음과 같다(표 1).", "그러나 달랐다."]),
+        ("1. 개요(2). 방법(3.5). 끝", ["1. 개요(2).", "방법(3.5).", "끝"]),
+        ("값은 (1). 이다.", ["값은 (1). 이다."]),
+        ("정말 그럴까?! 아니다…… 모르겠다.", ["정말 그럴까?!", "아니다……", "모르겠다."]),
+        # Latin
+        ("He left. She stayed.", ["He left.", "She stayed."]),
+        ("Really? Yes!", ["Really?", "Yes!"]),
+        (
+            "Mr. Kim and Mrs. Lee met Prof. Park in the U.S. today.",
+            ["Mr. Kim and Mrs. Lee met Prof. Park in the U.S. today."],
+        ),
+        ("e.g. this and Kim et al. reported it.", ["e.g. this and Kim et al. reported it."]),
+        ("서울(Seoul). 다음이다.", ["서울(Seoul).", "다음이다."]),
+    ],
+)
+def test_split_sentences(text, expected):
+    assert split_sentences([text]) == expected
+
+
+def test_lines_are_never_joined():
+    assert split_sentences(["제목", "", "첫 문장이다. 둘째 문장이다.", "셋째"]) == [
+        "제목",
+        "첫 문장이다.",
+        "둘째 문장이다.",
+        "셋째",
+    ]
+    assert split_sentences([]) == []
+
+
+def test_doctests():
+    assert doctest.testmod(sentence_splitter).failed == 0
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from korpus_extractor.extractor import OutputWriter, ZippedJsonExtractor
+from korpus_extractor.stats import HISTOGRAM_BUCKETS, CorpusStats, _bucket, get_member_prefix
+
+
+class DummyExtractor(ZippedJsonExtractor):
+    def extract(self, corpus_path, output_path, **kwargs):
+        raise NotImplementedError
+
+
+@pytest.mark.parametrize(
+    "length, bucket", [(0, 0), (1, 1), (2, 2), (3, 2), (4, 3), (7, 3), (8, 4), (2**31, 32), (2**40, 32)]
+)
+def test_length_buckets(length, bucket):
+    assert _bucket(length) == bucket < HISTOGRAM_BUCKETS
+
+
+def test_histograms_are_keyed_by_smallest_length():
+    stats = CorpusStats.from_member("a.json", ["a", "ab", "abc", "가나다라", "", "abcdefgh"])
+
+    result = stats.to_dict()
+    assert result["lines"] == 5
+    assert result["char_length_histogram"] == {"1": 1, "2": 2, "4": 1, "8": 1}
+    # "가나다라" is 12 bytes in UTF-8
+    assert result["byte_length_histogram"] == {"1": 1, "2": 2, "8": 2}
+
+
+def test_script_ratios():
+    stats = CorpusStats.from_member("a.json", ["가나 ab", "Ünï 12"])
+
+    result = stats.to_dict()
+    assert result["chars"] == 11
+    assert result["hangul_ratio"] == pytest.approx(2 / 11)
+    assert result["latin_ratio"] == pytest.approx(5 / 11)
+    assert CorpusStats().to_dict()["hangul_ratio"] == 0.0
+
+
+def test_failed_member_counts_for_error_rate_only():
+    failed = CorpusStats.from_member("NWRW0002.json", None)
+    assert (failed.members, failed.failed_members, failed.lines) == (1, 1, 0)
+
+    stats = CorpusStats()
+    stats.merge(CorpusStats.from_member("NWRW0001.json", ["문장"]), archive="a.zip")
+    stats.merge(failed, archive="a.zip")
+    result = stats.to_dict()
+    assert result["error_rate"] == 0.5
+    assert result["lines_per_archive"] == {"a.zip": 1}
+    assert result["lines_per_prefix"] == {"NWRW": 1}
+
+
+def test_merge_adds_counters_and_histograms():
+    total = CorpusStats()
+    total.merge(CorpusStats.from_member("d/NWRW0001.json", ["가나", "abc"]), archive="a.zip")
+    total.merge(CorpusStats.from_member("d/NPRW0001.json", ["가나다"]), archive="a.zip")
+    total.merge(CorpusStats.from_member("d/NWRW0002.json", ["x"]), archive="b.zip")
+    other = CorpusStats()
+    other.merge(CorpusStats.from_member("NWRW0003.json", ["yz"]), archive="b.zip")
+    total.merge(other)
+
+    expected = CorpusStats.from_member("all.json", ["가나", "abc", "가나다", "x", "yz"])
+    result = total.to_dict()
+    for key in ["lines", "chars", "bytes", "char_length_histogram", "byte_length_histogram", "hangul_ratio"]:
+        assert result[key] == expected.to_dict()[key]
+    assert result["members"] == 4
+    assert result["lines_per_archive"] == {"a.zip": 3, "b.zip": 2}
+    assert result["lines_per_prefix"] == {"NPRW": 1, "NWRW": 4}
+
+
+def test_member_prefix():
+    assert get_member_prefix("NIKL/NWRW1800000021.json") == "NWRW"
+    assert get_member_prefix("labels/0001.json") == ""
+    assert get_member_prefix("bundle.tar!TL_01.zip!NPRW0001.json") == "NPRW"
+
+
+def test_member_cut_short_by_limit_is_recounted(tmp_path):
+    members = {
+        "NWRW0001.json": ["가나다", "", "라마"],
+        "inner.zip!NPRW0001.json": ["", "바사", "아자차", "카타파하"],
+        "NWRW0002.json": ["never written"],
+        "NWRW0003.json": None,
+    }
+    stats = CorpusStats()
+    output_path = tmp_path / "out.txt"
+    with OutputWriter(str(output_path), limit=3) as writer:
+        DummyExtractor().process_members(
+            ((name, None) for name in members),
+            lambda source, filename: members[filename],
+            writer,
+            1,
+            1.0,
+            lambda _: None,
+            stats=stats,
+            archive_name="a.zip",
+        )
+
+    assert output_path.read_text(encoding="utf-8").splitlines() == ["가나다", "라마", "바사"]
+    result = stats.to_dict()
+    assert result["lines"] == 3
+    assert result["chars"] == 7
+    assert result["lines_per_archive"] == {"a.zip": 2, "a.zip!inner.zip": 1}
+    assert result["lines_per_prefix"] == {"NPRW": 1, "NWRW": 2}
+
+
+def test_save_writes_metadata_first(tmp_path):
+    path = tmp_path / "out" / "corpus.stats.json"
+    CorpusStats.from_member("a.json", ["가"]).save(str(path), input="corpus", type="modu")
+
+    result = json.loads(path.read_text(encoding="utf-8"))
+    assert list(result)[:3] == ["input", "type", "members"]
+    assert result["lines"] == 1